@@ -11,6 +11,7 @@ import questionary
 import getpass
 import subprocess
 import re
+import hashlib
 
 import api 
 
@@ -20,11 +21,14 @@ FOLDERS = ["Data", "Import", "Logs", "Output"]
 for folder in FOLDERS:
     (BASE_DIR / folder).mkdir(parents=True, exist_ok=True)
 
+DATA_DIR = BASE_DIR / "Data"
 IMPORT_DIR = BASE_DIR / "Import"
 OUTPUT_DIR = BASE_DIR / "Output"
 TIMESTAMP = datetime.now().strftime('%Y%m%d_%H%M%S')
 ACTIVITY_LOG_FILE = BASE_DIR / "Logs" / f"main_activity_log_{TIMESTAMP}.txt"
 ERROR_LOG_FILE = BASE_DIR / "Logs" / f"main_error_log_{TIMESTAMP}.txt"
+USER_INDEX_FILE = DATA_DIR / "user_index.pkl"
+USER_INDEX_COLUMNS = ["Department_AD", "User_Manager_AD", "Mail_AD", "First_Name_AD", "Last_Name_AD", "Mail"]
 
 def clear_console():
     """Clears the terminal screen."""
@@ -99,6 +103,77 @@ def import_files():
             log_error(f"Failed to import or process {file.name}: {e}")
     return imported
 
+def normalize_usernames(usernames):
+    """Strips any DOMAIN\\ prefix and lower-cases usernames so AD, Axonius and device data link on the same key."""
+    return usernames.fillna("").astype(str).str.split('\\').str[-1].str.strip().str.lower()
+
+def derive_emails(user_df, domain):
+    """Fills missing emails as first initial + last name @ domain, vectorized over the user table."""
+    mail = user_df["Mail_AD"]
+    if not domain: return mail
+    has_mail = mail.notna() & (mail.astype(str).str.strip() != "")
+    first_name = user_df["First_Name_AD"].fillna("").astype(str).str.strip()
+    last_name = user_df["Last_Name_AD"].fillna("").astype(str)
+    derived = first_name.str[0].str.lower() + last_name.str.replace(r"\s+", "", regex=True).str.lower() + f"@{domain}"
+    has_name = (first_name != "") & (last_name.str.strip() != "")
+    return mail.where(has_mail, derived.where(has_name, ""))
+
+def build_user_index(sources, axonius_users_df, domain):
+    """
+    Builds a username-keyed lookup of user details from AD (preferred) or Axonius users.
+    The index is cached in the Data folder and reused while the source data and email domain are unchanged.
+    """
+    if 'user_ad_data' in sources and not sources['user_ad_data'].empty:
+        log_activity("Preparing Active Directory user data for enrichment...")
+        source_label = "ad"
+        user_info_df = sources['user_ad_data'].rename(columns={
+            "User Display Name": "Primary_Username_For_Linking",
+            "User Department": "Department_AD", "User Manager": "User_Manager_AD",
+            "User Email": "Mail_AD", "User First Name": "First_Name_AD", "User Last Name": "Last_Name_AD"
+        })
+    elif not axonius_users_df.empty:
+        log_activity("AD data not found, preparing Axonius user data for enrichment...")
+        source_label = "axonius"
+        user_info_df = axonius_users_df.rename(columns={
+            "specific_data.data.username": "Primary_Username_For_Linking",
+            "specific_data.data.first_name": "First_Name_AD", "specific_data.data.last_name": "Last_Name_AD",
+            "specific_data.data.mail": "Mail_AD", "specific_data.data.user_manager": "User_Manager_AD"
+        })
+    else:
+        return pd.DataFrame()
+    if "Primary_Username_For_Linking" not in user_info_df.columns:
+        log_error(f"User data from '{source_label}' has no username column, skipping enrichment.")
+        return pd.DataFrame()
+
+    source_cols = ["Primary_Username_For_Linking"] + USER_INDEX_COLUMNS[:-1]
+    user_info_df = user_info_df.reindex(columns=source_cols)
+    fingerprint = hashlib.sha1(f"{source_label}|{domain}".encode())
+    fingerprint.update(pd.util.hash_pandas_object(user_info_df.astype(str), index=False).to_numpy().tobytes())
+    fingerprint = fingerprint.hexdigest()
+
+    if USER_INDEX_FILE.exists():
+        try:
+            cached = pd.read_pickle(USER_INDEX_FILE)
+            if cached.get("fingerprint") == fingerprint:
+                log_activity(f"Reusing cached user index from {USER_INDEX_FILE}")
+                return cached["index"]
+        except Exception as e:
+            log_error(f"Failed to read cached user index, rebuilding it: {e}")
+
+    log_activity(f"Building user index from {len(user_info_df)} {source_label} user records...")
+    user_info_df = user_info_df.assign(Primary_Username_For_Linking=normalize_usernames(user_info_df["Primary_Username_For_Linking"]))
+    user_info_df = user_info_df[user_info_df["Primary_Username_For_Linking"] != ""]
+    user_info_df = user_info_df.drop_duplicates('Primary_Username_For_Linking').set_index('Primary_Username_For_Linking')
+    if domain: log_activity(f"Deriving missing email addresses with default domain: {domain}")
+    user_info_df["Mail"] = derive_emails(user_info_df, domain)
+
+    try:
+        pd.to_pickle({"fingerprint": fingerprint, "index": user_info_df}, USER_INDEX_FILE)
+        log_activity(f"User index with {len(user_info_df)} users saved to {USER_INDEX_FILE}")
+    except Exception as e:
+        log_error(f"Failed to save user index to {USER_INDEX_FILE}: {e}")
+    return user_info_df
+
 def consolidate_data(sources, user_ad_data, axonius_users_df):
     """Consolidates data from all sources, enriches with user info, and standardizes columns."""
     log_activity("--- Consolidating all collected data ---")
@@ -117,26 +192,8 @@ def consolidate_data(sources, user_ad_data, axonius_users_df):
         "Last Used Users Departments": "Source_User_Department",
     }
     
-    user_info_df = pd.DataFrame()
-    if 'user_ad_data' in sources and not sources['user_ad_data'].empty:
-        log_activity("Preparing Active Directory user data for enrichment...")
-        user_ad_data = sources['user_ad_data']
-        user_info_df = user_ad_data.rename(columns={
-            "User Display Name": "Primary_Username_For_Linking",
-            "User Department": "Department_AD", "User Manager": "User_Manager_AD",
-            "User Email": "Mail_AD", "User First Name": "First_Name_AD", "User Last Name": "Last_Name_AD"
-        })
-        user_info_df['Primary_Username_For_Linking'] = user_info_df['Primary_Username_For_Linking'].astype(str)
-        user_info_df = user_info_df.drop_duplicates('Primary_Username_For_Linking')
-    elif not axonius_users_df.empty:
-        log_activity("AD data not found, preparing Axonius user data for enrichment...")
-        user_info_df = axonius_users_df.rename(columns={
-            "specific_data.data.username": "Primary_Username_For_Linking",
-            "specific_data.data.first_name": "First_Name_AD", "specific_data.data.last_name": "Last_Name_AD",
-            "specific_data.data.mail": "Mail_AD", "specific_data.data.user_manager": "User_Manager_AD"
-        })
-        user_info_df["Primary_Username_For_Linking"] = user_info_df["Primary_Username_For_Linking"].astype(str).str.split('\\').str[-1]
-        user_info_df = user_info_df.drop_duplicates('Primary_Username_For_Linking')
+    default_domain = SCAN_SETTINGS.get("default_email_domain")
+    user_index = build_user_index(sources, axonius_users_df, default_domain)
 
     for source_name_original, df_source_original in sources.items():
         if df_source_original.empty or source_name_original in ['user_ad_data', 'Axonius_Users_RAW']: continue
@@ -188,7 +245,7 @@ def consolidate_data(sources, user_ad_data, axonius_users_df):
                 "Asset_Unique_ID": row.get("Asset_Unique_ID"), "IP Address": ip_str,
                 "Hostname": row.get("Hostname"), "Last_Seen_Device": formatted_last_seen,
                 "User": full_user_string,
-                "Primary_Username_For_Linking": primary_user_for_link.split('\\')[-1] if primary_user_for_link else "",
+                "Primary_Username_For_Linking": primary_user_for_link,
                 "Source": source_name_original, "Department_From_Source": department
             })
 
@@ -196,36 +253,23 @@ def consolidate_data(sources, user_ad_data, axonius_users_df):
         log_activity("No device data to consolidate."); return pd.DataFrame()
     devices_df = pd.DataFrame(all_rows)
 
-    if not user_info_df.empty:
+    if not user_index.empty:
         log_activity("Enriching device data with user details...")
-        final_df = pd.merge(devices_df, user_info_df, on="Primary_Username_For_Linking", how="left")
+        link_keys = normalize_usernames(devices_df["Primary_Username_For_Linking"])
+        user_details = user_index.reindex(link_keys.to_numpy()).set_axis(devices_df.index)
+        final_df = pd.concat([devices_df, user_details], axis=1)
     else:
         final_df = devices_df
-        for col in ["User_Full_Name_AD", "Department_AD", "User_Manager_AD", "Mail_AD", "First_Name_AD", "Last_Name_AD"]:
+        for col in USER_INDEX_COLUMNS:
             if col not in final_df.columns: final_df[col] = ""
 
     log_activity("Assigning final department...")
     final_df['Department'] = final_df['Department_AD'].fillna(final_df['Department_From_Source'])
     final_df['Department'] = final_df['Department'].fillna(final_df['IP Address'].apply(lambda ip: get_department(ip, DEPARTMENT_MAPPING)))
-    
-    def derive_email(row, domain):
-        if pd.notna(row.get("Mail_AD")) and row.get("Mail_AD") != "": return row["Mail_AD"]
-        first_name = str(row.get("First_Name_AD", "")); last_name = str(row.get("Last_Name_AD", ""))
-        if first_name and last_name:
-            first_initial = first_name[0].lower()
-            processed_last_name = "".join(last_name.split()).lower()
-            return f"{first_initial}{processed_last_name}@{domain}"
-        return ""
-
-    default_domain = SCAN_SETTINGS.get("default_email_domain")
-    if default_domain:
-        log_activity(f"Deriving missing email addresses with default domain: {default_domain}")
-        final_df["Mail"] = final_df.apply(lambda row: derive_email(row, default_domain), axis=1)
-    else:
-        final_df["Mail"] = final_df["Mail_AD"]
 
     log_activity("Assigning department heads...")
-    final_df["Department Head"] = final_df["Department"].apply(lambda x: DEPARTMENT_HEADS.get(str(x).split('||')[0].strip(), "N/A"))
+    primary_department = final_df["Department"].astype(str).str.partition('||')[0].str.strip()
+    final_df["Department Head"] = primary_department.map(DEPARTMENT_HEADS).fillna("N/A")
     final_df = final_df.fillna("")
     
     cols_to_keep = [